@@ -9,7 +9,16 @@ except ImportError:
     import plotly.express as px
 import pydeck as pdk
 import numpy as np
+try:
+    from numba import njit, types
+    from numba.typed import Dict
+except ImportError:
+    # Optional: fall back to the pandas isotope counter
+    njit = None
 from io import StringIO
+import json
+from pathlib import Path
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 
 # Configure page
 st.set_page_config(
@@ -88,92 +97,262 @@ ISO_CODES = {
     "USA": "USA"
 }
 
-# Main app
-def main():
-    st.title("🌍 Global Isotope Production Dashboard")
-    st.markdown("Visualize worldwide production of medical and industrial isotopes")
-    
-    # Load data section
-    st.subheader("Isotope Production Data")
-    st.info("Using dataset: isotope_production_by_country_2002.csv")
-    
-    # Replace the sample_data section with:
-uploaded_file = st.file_uploader("D:/lenovo/data visuals/isotope_production_by_country_2002.csv", type=["csv"])
-if uploaded_file:
-    df = pd.read_csv(uploaded_file)
-else:
-    df = pd.read_csv("D:/lenovo/data visuals/isotope_production_by_country_2002.csv")  # Use sample if no upload
-    
-    # Load data
-    df = pd.read_csv("D:/lenovo/data visuals/isotope_production_by_country_2002.csv")
+# Column-wise lookup tables indexed by categorical codes; the trailing entry
+# is the default for countries missing from the tables (code -1)
+_COUNTRIES = list(COUNTRY_COORDS)
+_LAT_ARR = np.array([COUNTRY_COORDS[c]['lat'] for c in _COUNTRIES] + [0.0], dtype='float32')
+_LON_ARR = np.array([COUNTRY_COORDS[c]['lon'] for c in _COUNTRIES] + [0.0], dtype='float32')
+_ISO_ARR = np.array([ISO_CODES[c] for c in _COUNTRIES] + [''], dtype=object)
+
+DATA_PATH = "D:/lenovo/data visuals/isotope_production_by_country_2002.csv"
+
+# Bound for caches keyed on filter values or uploads; cache_resource is shared across sessions
+CACHE_MAX_ENTRIES = 32
+
+# Numba kernels cost seconds of JIT per process; only worth it on inputs this large
+NUMBA_MIN_ROWS = 100_000
+
+# Natural Earth 1:110m country shapes shipped with the app, keyed by the iso_a3 code used in ISO_CODES
+WORLD_GEOJSON_PATH = Path(__file__).parent / "ne_110m_admin_0_countries.geojson"
+
+# Load, clean and enrich the dataset once per input; reruns reuse the cached frame
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, hash_funcs={UploadedFile: lambda f: f.getvalue()})
+def load_data(path_or_file):
+    df = pd.read_csv(
+        path_or_file,
+        engine='pyarrow',
+        usecols=['Country', 'Major_Isotopes', 'Total_Production_TBq'],
+        # An all-blank isotope column would otherwise be inferred as float64
+        dtype={'Major_Isotopes': 'string'},
+    )
     
     # Data cleaning
     # Convert "NR" to NaN and handle zeros
-    df['Total_Production_TBq'] = pd.to_numeric(df['Total_Production_TBq'], errors='coerce')
-    df['Total_Production_TBq'].fillna(0, inplace=True)
+    df['Total_Production_TBq'] = pd.to_numeric(df['Total_Production_TBq'], errors='coerce').fillna(0)
     
     # Add coordinates and ISO codes
-    df['Latitude'] = df['Country'].map(lambda x: COUNTRY_COORDS.get(x, {}).get('lat', 0))
-    df['Longitude'] = df['Country'].map(lambda x: COUNTRY_COORDS.get(x, {}).get('lon', 0))
-    df['ISO'] = df['Country'].map(lambda x: ISO_CODES.get(x, ''))
+    codes = pd.Categorical(df['Country'], categories=_COUNTRIES).codes
+    df['Latitude'] = _LAT_ARR[codes]
+    df['Longitude'] = _LON_ARR[codes]
+    df['ISO'] = _ISO_ARR[codes]
     
-    # Create isotope lists
-    df['Isotope_List'] = df['Major_Isotopes'].apply(
-        lambda x: [iso.strip() for iso in x.split(',')] if isinstance(x, str) else []
-    )
+    # Low-cardinality labels: filters and groupbys work on integer codes
+    df = df.astype({'Country': 'category', 'ISO': 'category'})
     
-    # Filters
-    st.sidebar.header("Filters")
-    min_production = st.sidebar.slider(
-        "Minimum Production (TBq)", 
-        0, 
-        int(df['Total_Production_TBq'].max()) + 1000,
-        100
-    )
-    
-    selected_countries = st.sidebar.multiselect(
-        "Select Countries", 
-        df['Country'].unique(),
-        default=df['Country'].unique()[:5]
+    # Create isotope lists: comma-separated tokens, whitespace-trimmed, empty tokens dropped
+    isotopes = df['Major_Isotopes'].str.findall(r'[^,\s](?:[^,]*[^,\s])?')
+    df['Isotope_List'] = isotopes.where(isotopes.notna(), pd.Series([[]] * len(df), index=df.index))
+    return df
+
+if njit is not None:
+    # Single-pass comma tokenizer over the joined isotope strings, compiled to native code
+    @njit(cache=True)
+    def _count_tokens(text):
+        counts = Dict.empty(key_type=types.unicode_type, value_type=types.int64)
+        start = 0
+        n = len(text)
+        for i in range(n + 1):
+            if i == n or text[i] == ',':
+                token = text[start:i].strip()
+                if token:
+                    counts[token] = counts.get(token, 0) + 1
+                start = i + 1
+        return counts
+else:
+    _count_tokens = None
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def count_isotopes(data_key, _df):
+    # Same tokens either way; the kernel's JIT cost only pays off on large inputs
+    if _count_tokens is None or len(_df) <= NUMBA_MIN_ROWS:
+        return (
+            _df['Isotope_List'].explode().value_counts()
+            .rename_axis('Isotope').reset_index(name='Count')
+        )
+    counts = _count_tokens(','.join(_df['Major_Isotopes'].dropna()))
+    return (
+        pd.DataFrame({'Isotope': list(counts.keys()), 'Count': list(counts.values())})
+        .sort_values('Count', ascending=False, kind='stable', ignore_index=True)
     )
+
+# Memoize filtered views per (data source, min production, country set); the underscored frame is not hashed
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def filter_df(data_key, min_production, countries, _df):
+    selected_set = frozenset(countries)
+    mask = _df['Country'].isin(selected_set) & (_df['Total_Production_TBq'] >= min_production)
+    return _df[mask]
+
+# Read-only shapes shared by every session; cache_resource avoids unpickling a copy per use
+@st.cache_resource
+def load_world_geojson():
+    with open(WORLD_GEOJSON_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+# Figure builders: cached per filter key, the underscored frame is not hashed
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES)
+def build_choropleth(key, _filtered_df):
+    # Attach production to matching country shapes; deck.gl maps it to colour on the GPU
+    # Sum per country, as the pie does, so both views agree on repeated rows
+    rows = _filtered_df.groupby('ISO', observed=True).agg(
+        Country=('Country', 'first'),
+        Major_Isotopes=('Major_Isotopes', 'first'),
+        Total_Production_TBq=('Total_Production_TBq', 'sum'),
+    ).fillna({'Major_Isotopes': ''})
+    shapes = {f['properties'].get('iso_a3'): f['geometry'] for f in load_world_geojson()['features']}
+    rows = rows[rows.index.isin(list(shapes))]
     
-    # Apply filters
-    filtered_df = df[
-        (df['Total_Production_TBq'] >= min_production) &
-        (df['Country'].isin(selected_countries))
-    ]
+    # Colour ramp spans the drawn countries' range, like the Plotly colorbar did
+    min_production = float(rows['Total_Production_TBq'].min()) if not rows.empty else 0.0
+    max_production = float(rows['Total_Production_TBq'].max()) if not rows.empty else 0.0
+    span = max_production - min_production
+    features = []
+    for iso, country, isotopes, production in zip(
+        rows.index, rows['Country'], rows['Major_Isotopes'], rows['Total_Production_TBq']
+    ):
+        features.append({
+            "type": "Feature",
+            "geometry": shapes[iso],
+            "properties": {
+                "Country": country,
+                "Major_Isotopes": isotopes,
+                "Total_Production_TBq": float(production),
+                "level": (production - min_production) / span if span > 0 else 1.0,
+            },
+        })
     
-    # Main visualization tabs
-    tab1, tab2, tab3 = st.tabs(["World Production Map", "Country Comparison", "Isotope Analysis"])
+    layer = pdk.Layer(
+        "GeoJsonLayer",
+        {"type": "FeatureCollection", "features": features},
+        # Linear ramp from Plasma's dark purple to its yellow
+        get_fill_color="[13 + 227 * properties.level, 8 + 241 * properties.level, 135 - 102 * properties.level, 200]",
+        get_line_color=[255, 255, 255, 120],
+        line_width_min_pixels=1,
+        pickable=True,
+        auto_highlight=True,
+    )
     
-    with tab1:
-        st.header("Global Isotope Production Map")
+    deck = pdk.Deck(
+        layers=[layer],
+        initial_view_state=pdk.ViewState(latitude=20, longitude=0, zoom=1, pitch=0),
+        tooltip={
+            "html": "<b>{Country}</b><br>"
+                    "Production: {Total_Production_TBq} TBq<br>"
+                    "Major Isotopes: {Major_Isotopes}",
+            "style": {"backgroundColor": "steelblue", "color": "white"}
+        }
+    )
+    return deck, min_production, max_production, len(features)
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES)
+def build_top_countries_bar(key, _filtered_df):
+    top_countries = _filtered_df.nlargest(10, 'Total_Production_TBq')
+    fig = px.bar(
+        top_countries,
+        x='Total_Production_TBq',
+        y='Country',
+        orientation='h',
+        color='Total_Production_TBq',
+        text='Total_Production_TBq',
+        height=500,
+        title="Top 10 Isotope Producing Countries"
+    )
+    fig.update_traces(texttemplate='%{text:.2s} TBq', textposition='outside')
+    fig.update_layout(yaxis={'categoryorder':'total ascending'})
+    return fig
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES)
+def build_production_pie(key, _filtered_df):
+    # One slice per country, summed in pandas (numba engine for large inputs when available)
+    use_numba = njit is not None and len(_filtered_df) > NUMBA_MIN_ROWS
+    per_country = _filtered_df.groupby('Country', observed=True)['Total_Production_TBq'].sum(
+        engine='numba' if use_numba else None
+    ).reset_index()
+    fig = px.pie(
+        per_country,
+        values='Total_Production_TBq',
+        names='Country',
+        height=500,
+        title="Share of Global Isotope Production"
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES)
+def build_isotope_bar(key, _isotope_counts):
+    fig = px.bar(
+        _isotope_counts.head(10),
+        x='Count',
+        y='Isotope',
+        orientation='h',
+        color='Count',
+        height=400,
+        title="Top 10 Isotopes by Country Production"
+    )
+    fig.update_layout(yaxis={'categoryorder':'total ascending'})
+    return fig
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES)
+def build_treemap(key, _matrix_df):
+    return px.treemap(
+        _matrix_df,
+        path=['Isotope', 'Country'],
+        values='Production',
+        color='Production',
+        color_continuous_scale='RdYlGn',
+        height=400,
+        title="Isotope Production by Country"
+    )
+
+# Styler renders every cell through Jinja; keep the finished HTML per filter key
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def style_table(key, _filtered_df):
+    return (_filtered_df[['Country', 'Major_Isotopes', 'Total_Production_TBq']]
+            .sort_values('Total_Production_TBq', ascending=False)
+            .style.format({'Total_Production_TBq': '{:,.1f} TBq'})
+            # Text cells come from user uploads and end up in unsafe_allow_html markdown
+            .format(escape='html', subset=['Country', 'Major_Isotopes'])
+            .background_gradient(cmap='Blues', subset=['Total_Production_TBq'])
+            .to_html())
+
+# Tab renderers: each is a fragment, so widgets inside one only rerun that tab
+@st.fragment
+def render_map_tab(filtered_df, filter_key):
+    st.header("Global Isotope Production Map")
+    # Only one map renders per run
+    map_view = st.radio("Map view", ["Bubble Map", "Choropleth"], horizontal=True)
+
+    if map_view == "Bubble Map":
         st.caption("Bubble size represents production volume")
-        
-        # Calculate viewport
-        lat = filtered_df['Latitude'].mean() if not filtered_df.empty else 0
-        lon = filtered_df['Longitude'].mean() if not filtered_df.empty else 0
-        
+
+        # Calculate viewport, centred on the production-weighted mass of the bubbles
+        w = filtered_df['Total_Production_TBq'].to_numpy(dtype='float64')
+        lat = np.average(filtered_df['Latitude'], weights=w) if w.sum() > 0 else 0
+        lon = np.average(filtered_df['Longitude'], weights=w) if w.sum() > 0 else 0
+
+        # Ship only the columns the layer and tooltip read, with the radius precomputed
+        tooltip_df = filtered_df[['Country', 'Latitude', 'Longitude', 'Total_Production_TBq', 'Major_Isotopes']].copy()
+        tooltip_df['radius'] = tooltip_df['Total_Production_TBq'] / 20
+
         # Create PyDeck map
         layer = pdk.Layer(
             "ScatterplotLayer",
-            filtered_df,
+            tooltip_df,
             get_position=['Longitude', 'Latitude'],
-            get_radius='Total_Production_TBq/20',
+            get_radius='radius',
             get_fill_color=[255, 200, 0, 180],
             pickable=True,
             auto_highlight=True,
             radius_min_pixels=5,
             radius_max_pixels=100,
         )
-        
+
         view_state = pdk.ViewState(
             latitude=lat,
             longitude=lon,
             zoom=1,
             pitch=0,
         )
-        
+
         deck = pdk.Deck(
             layers=[layer],
             initial_view_state=view_state,
@@ -184,138 +363,136 @@ else:
                 "style": {"backgroundColor": "steelblue", "color": "white"}
             }
         )
-        
+
         st.pydeck_chart(deck)
-        
-        # Add choropleth map
+    else:
         st.subheader("Production by Country")
-        fig = px.choropleth(
-            filtered_df,
-            locations="ISO",
-            color="Total_Production_TBq",
-            hover_name="Country",
-            hover_data=["Major_Isotopes", "Total_Production_TBq"],
-            projection="natural earth",
-            color_continuous_scale=px.colors.sequential.Plasma,
-            height=500,
-            title="Global Isotope Production (TBq)"
-        )
-        fig.update_layout(margin={"r":0,"t":40,"l":0,"b":0})
-        st.plotly_chart(fig, use_container_width=True)
-    
-    with tab2:
-        st.header("Country Comparison")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Top Producing Countries")
-            top_countries = filtered_df.sort_values('Total_Production_TBq', ascending=False).head(10)
-            fig = px.bar(
-                top_countries,
-                x='Total_Production_TBq',
-                y='Country',
-                orientation='h',
-                color='Total_Production_TBq',
-                text='Total_Production_TBq',
-                height=500,
-                title="Top 10 Isotope Producing Countries"
-            )
-            fig.update_traces(texttemplate='%{text:.2s} TBq', textposition='outside')
-            fig.update_layout(yaxis={'categoryorder':'total ascending'})
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            st.subheader("Production Distribution")
-            fig = px.pie(
-                filtered_df,
-                values='Total_Production_TBq',
-                names='Country',
-                height=500,
-                title="Share of Global Isotope Production"
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig, use_container_width=True)
-        
-        st.subheader("Detailed Production Data")
-        st.dataframe(filtered_df[['Country', 'Major_Isotopes', 'Total_Production_TBq']]
-                     .sort_values('Total_Production_TBq', ascending=False)
-                     .style.format({'Total_Production_TBq': '{:,.1f} TBq'})
-                     .background_gradient(cmap='Blues', subset=['Total_Production_TBq']), 
-                     height=400)
-    
-    with tab3:
-        st.header("Isotope Analysis")
-        
-        # Create a list of all isotopes
-        all_isotopes = []
-        for isotopes in df['Isotope_List']:
-            all_isotopes.extend(isotopes)
-        
-        isotope_counts = pd.Series(all_isotopes).value_counts().reset_index()
-        isotope_counts.columns = ['Isotope', 'Count']
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Most Common Isotopes")
-            fig = px.bar(
-                isotope_counts.head(10),
-                x='Count',
-                y='Isotope',
-                orientation='h',
-                color='Count',
-                height=400,
-                title="Top 10 Isotopes by Country Production"
+        deck, min_production, max_production, n_countries = build_choropleth(filter_key, filtered_df)
+        st.pydeck_chart(deck)
+        if n_countries:
+            st.caption(
+                f"Colour scale: dark purple = {min_production:,g} TBq → yellow = {max_production:,g} TBq"
             )
-            fig.update_layout(yaxis={'categoryorder':'total ascending'})
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            st.subheader("Isotope Production Network")
-            st.markdown("""
-            **Key Isotopes and Their Producers:**
-            - Medical Imaging: Tc-99m, I-131
-            - Industrial: Ir-192, Co-60
-            - Research: C-11, F-18
-            """)
-            
-            # Create isotope-country matrix
-            isotope_matrix = []
-            for _, row in filtered_df.iterrows():
-                for isotope in row['Isotope_List']:
-                    isotope_matrix.append({
-                        'Isotope': isotope,
-                        'Country': row['Country'],
-                        'Production': row['Total_Production_TBq']
-                    })
-            
-            if isotope_matrix:
-                matrix_df = pd.DataFrame(isotope_matrix)
-                fig = px.treemap(
-                    matrix_df,
-                    path=['Isotope', 'Country'],
-                    values='Production',
-                    color='Production',
-                    color_continuous_scale='RdYlGn',
-                    height=400,
-                    title="Isotope Production by Country"
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.warning("No isotope data available for selected countries")
-        
-        st.subheader("Isotope Production Details")
+
+@st.fragment
+def render_comparison_tab(filtered_df, filter_key):
+    st.header("Country Comparison")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Top Producing Countries")
+        fig = build_top_countries_bar(filter_key, filtered_df)
+        st.plotly_chart(fig, use_container_width=True)
+
+    with col2:
+        st.subheader("Production Distribution")
+        fig = build_production_pie(filter_key, filtered_df)
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Detailed Production Data")
+    st.markdown(
+        f'<div style="height: 400px; overflow: auto;">{style_table(filter_key, filtered_df)}</div>',
+        unsafe_allow_html=True
+    )
+
+@st.fragment
+def render_isotope_tab(df, filtered_df, data_key, filter_key):
+    st.header("Isotope Analysis")
+
+    # Create a list of all isotopes
+    isotope_counts = count_isotopes(data_key, df)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Most Common Isotopes")
+        fig = build_isotope_bar(data_key, isotope_counts)
+        st.plotly_chart(fig, use_container_width=True)
+
+    with col2:
+        st.subheader("Isotope Production Network")
         st.markdown("""
-        | Isotope | Common Applications | Top Producers |
-        |---------|----------------------|---------------|
-        | **Tc-99m** | Medical imaging | Belgium, India, Chile |
-        | **I-131** | Thyroid treatment | Belgium, Iran, Korea |
-        | **Ir-192** | Industrial radiography | Australia, Japan, USA |
-        | **Mo-99** | Parent for Tc-99m | Belgium, South Africa |
-        | **F-18** | PET scans | Austria, Switzerland, Turkey |
-        | **Co-60** | Sterilization, cancer therapy | India, Russia, Canada |
+        **Key Isotopes and Their Producers:**
+        - Medical Imaging: Tc-99m, I-131
+        - Industrial: Ir-192, Co-60
+        - Research: C-11, F-18
         """)
 
+        # Create isotope-country matrix
+        matrix_df = (
+            filtered_df[['Country', 'Total_Production_TBq', 'Isotope_List']]
+            .explode('Isotope_List')
+            .rename(columns={'Isotope_List': 'Isotope', 'Total_Production_TBq': 'Production'})
+            .dropna(subset=['Isotope'])
+            .groupby(['Isotope', 'Country'], observed=True, as_index=False)['Production'].sum()
+        )
+
+        if not matrix_df.empty:
+            fig = build_treemap(filter_key, matrix_df)
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.warning("No isotope data available for selected countries")
+
+    st.subheader("Isotope Production Details")
+    st.markdown("""
+    | Isotope | Common Applications | Top Producers |
+    |---------|----------------------|---------------|
+    | **Tc-99m** | Medical imaging | Belgium, India, Chile |
+    | **I-131** | Thyroid treatment | Belgium, Iran, Korea |
+    | **Ir-192** | Industrial radiography | Australia, Japan, USA |
+    | **Mo-99** | Parent for Tc-99m | Belgium, South Africa |
+    | **F-18** | PET scans | Austria, Switzerland, Turkey |
+    | **Co-60** | Sterilization, cancer therapy | India, Russia, Canada |
+    """)
+
+# Main app
+def main():
+    st.title("🌍 Global Isotope Production Dashboard")
+    st.markdown("Visualize worldwide production of medical and industrial isotopes")
+    
+    # Load data section
+    st.subheader("Isotope Production Data")
+    st.info("Using dataset: isotope_production_by_country_2002.csv")
+    
+    uploaded_file = st.file_uploader(DATA_PATH, type=["csv"])
+    df = load_data(uploaded_file if uploaded_file else DATA_PATH)
+    data_key = uploaded_file.file_id if uploaded_file else DATA_PATH
+    
+    # Filters
+    st.sidebar.header("Filters")
+    min_production = st.sidebar.slider(
+        "Minimum Production (TBq)", 
+        0, 
+        int(df['Total_Production_TBq'].max()) + 1000,
+        100
+    )
+    
+    selected_countries = st.sidebar.multiselect(
+        "Select Countries", 
+        df['Country'].unique(),
+        default=df['Country'].unique()[:5]
+    )
+    
+    # Apply filters
+    countries_key = tuple(sorted(selected_countries))
+    filtered_df = filter_df(data_key, min_production, countries_key, df)
+    filter_key = (data_key, min_production, countries_key)
+    
+    # Main visualization views: unlike st.tabs, only the selected view is computed
+    view = st.radio(
+        "View",
+        ["World Production Map", "Country Comparison", "Isotope Analysis"],
+        horizontal=True,
+        key="active_tab"
+    )
+    
+    if view == "World Production Map":
+        render_map_tab(filtered_df, filter_key)
+    elif view == "Country Comparison":
+        render_comparison_tab(filtered_df, filter_key)
+    else:
+        render_isotope_tab(df, filtered_df, data_key, filter_key)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file